@@ -4,115 +4,274 @@
 import asyncio
 import json
 import logging
-from typing import Dict, Any, List
+import time
+from typing import Callable, Dict, Any, List, Literal, NamedTuple, Optional, Tuple
 from contextlib import AsyncExitStack
 
+import httpx
 from mcp import ClientSession
 from mcp.client.sse import sse_client
-from mcp.types import CallToolRequest, ListToolsRequest, GetPromptRequest, ListPromptsRequest
+from mcp.client.streamable_http import streamablehttp_client
+from mcp.types import (
+    CallToolRequest,
+    ListToolsRequest,
+    GetPromptRequest,
+    ListPromptsRequest,
+    Prompt,
+    PromptListChangedNotification,
+    ServerNotification,
+    TextContent,
+    Tool,
+    ToolListChangedNotification,
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Connection pool settings for the HTTP client backing each MCP session
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=100, max_connections=200, keepalive_expiry=30.0)
+# Both SDK transports build their httpx timeout from these: connect, write
+# and pool waits are short, while reads stay long enough for idle SSE streams
+_HTTP_TIMEOUT_SECONDS = 5.0
+_SSE_READ_TIMEOUT_SECONDS = 300.0
+_HTTP_TIMEOUT = httpx.Timeout(_HTTP_TIMEOUT_SECONDS, read=_SSE_READ_TIMEOUT_SECONDS)
+
+def _create_http_client(headers: Dict[str, str] = None,
+                        timeout: httpx.Timeout = None,
+                        auth: httpx.Auth = None) -> httpx.AsyncClient:
+    """Create the pooled HTTP client used by the MCP transport"""
+    return httpx.AsyncClient(
+        headers=headers,
+        timeout=timeout if timeout is not None else _HTTP_TIMEOUT,
+        auth=auth,
+        limits=_HTTP_LIMITS,
+        follow_redirects=True,
+    )
+
+def _tool_to_dict(tool: Tool) -> Dict[str, Any]:
+    """Convert a listed tool into the dict returned by MCPClient.list_tools"""
+    return {
+        "name": tool.name,
+        "description": tool.description,
+        "inputSchema": tool.inputSchema,
+        "annotations": tool.annotations.model_dump(exclude_none=True) if tool.annotations else {}
+    }
+
+def _prompt_to_dict(prompt: Prompt) -> Dict[str, Any]:
+    """Convert a listed prompt into the dict returned by MCPClient.list_prompts"""
+    return {
+        "name": prompt.name,
+        "description": prompt.description,
+        "arguments": [
+            {"name": arg.name, "description": arg.description, "required": arg.required}
+            for arg in prompt.arguments or ()
+        ]
+    }
+
+def _extract_text(content: list) -> str:
+    """Join the text items of a tool result"""
+    if not content:
+        return "No content returned"
+    return "\n".join(item.text for item in content if isinstance(item, TextContent))
+
 class MCPClient():
-    """Example MCP Client that connects to the weather server via SSE"""
+    """
+    Example MCP Client that connects to the weather server via SSE
     
-    def __init__(self, server_url: str = "http://localhost:8000"):
+    A single HTTP client with a keep-alive pool is created per connect() and
+    reused for every request until disconnect(), so keep one connected
+    MCPClient around rather than connecting per call.
+    
+    Pass transport="streamable_http" to use the Streamable HTTP transport
+    (the server's /mcp endpoint) instead of SSE; requests then go out as
+    plain POSTs over the same pooled connections rather than alongside a
+    long-lived event stream.
+    """
+    
+    def __init__(self,
+                 server_url: str = "http://localhost:8000",
+                 cache_ttl_seconds: float = 300,
+                 transport: Literal["sse", "streamable_http"] = "sse"):
         self.server_url = server_url
+        self.transport = transport
         self.sse_url = f"{server_url}/sse"
+        self.mcp_url = f"{server_url}/mcp"
         self.session = None
         self.exit_stack = AsyncExitStack()
+        # Pooled HTTP client the transport opened for the current session
+        self.http_client: Optional[httpx.AsyncClient] = None
+        
+        # Tool and prompt listings rarely change for a server, so keep them
+        # for cache_ttl_seconds along with the time they were fetched
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self._tools_cache: Optional[Tuple[float, List[Dict[str, Any]]]] = None
+        self._prompts_cache: Optional[Tuple[float, List[Dict[str, Any]]]] = None
+        # Called with this client whenever its tool listing is invalidated, so
+        # caches built from the listing elsewhere are dropped with it
+        self._tools_cache_listeners: List[Callable[["MCPClient"], None]] = []
     
     async def connect(self):
-        """Connect to the MCP server via SSE"""
+        """Connect to the MCP server via the configured transport"""
         try:
-            logger.info(f"Connecting to MCP server at {self.sse_url}")
+            url = self.mcp_url if self.transport == "streamable_http" else self.sse_url
+            logger.info("Connecting to MCP server at %s", url)
+            self.invalidate_tools_cache()
+            self.invalidate_prompts_cache()
             
-            # Create SSE transport using async context manager
-            sse_transport = await self.exit_stack.enter_async_context(sse_client(self.sse_url))
-            read_stream, write_stream = sse_transport
+            # Create transport using async context manager
+            if self.transport == "streamable_http":
+                read_stream, write_stream, _ = await self.exit_stack.enter_async_context(
+                    streamablehttp_client(
+                        url,
+                        timeout=_HTTP_TIMEOUT_SECONDS,
+                        sse_read_timeout=_SSE_READ_TIMEOUT_SECONDS,
+                        httpx_client_factory=self._open_http_client,
+                    )
+                )
+            else:
+                read_stream, write_stream = await self.exit_stack.enter_async_context(
+                    sse_client(
+                        url,
+                        timeout=_HTTP_TIMEOUT_SECONDS,
+                        sse_read_timeout=_SSE_READ_TIMEOUT_SECONDS,
+                        httpx_client_factory=self._open_http_client,
+                    )
+                )
             
             # Create session using async context manager
             self.session = await self.exit_stack.enter_async_context(
-                ClientSession(read_stream, write_stream)
+                ClientSession(read_stream, write_stream, message_handler=self._handle_message)
             )
             
             # Initialize the session
             init_result = await self.session.initialize()
-            logger.info(f"Connected to server: {init_result.serverInfo.name} v{init_result.serverInfo.version}")
+            logger.info("Connected to server: %s v%s", init_result.serverInfo.name, init_result.serverInfo.version)
             
             return True
             
+        except asyncio.CancelledError:
+            # When the connection fails, the transport's task group cancels
+            # initialize() from its own cancel scope; closing the stack exits
+            # that scope and absorbs it. A cancellation of this task from
+            # outside is still pending afterwards and is passed on.
+            await self._close_failed_connect()
+            task = asyncio.current_task()
+            if task is not None and getattr(task, "cancelling", lambda: 0)():
+                raise
+            logger.error("Failed to connect to MCP server: transport closed during initialize")
+            return False
         except Exception as e:
             logger.exception("Failed to connect to MCP server")
+            await self._close_failed_connect()
             return False
     
+    async def _close_failed_connect(self):
+        """Close whatever a failed connect() had opened so the client can retry"""
+        try:
+            await self.exit_stack.aclose()
+        except Exception as e:
+            logger.debug("Error closing failed connection: %s", e)
+        self.session = None
+        self.http_client = None
+    
     async def disconnect(self):
         """Disconnect from the MCP server"""
         try:
             await self.exit_stack.aclose()
             self.session = None
+            self.http_client = None
+            self.invalidate_tools_cache()
+            self.invalidate_prompts_cache()
             logger.info("Disconnected from MCP server")
         except Exception as e:
-            logger.error(f"Error during disconnect: {e}")
+            logger.error("Error during disconnect: %s", e)
+    
+    def _open_http_client(self, headers: Dict[str, str] = None,
+                          timeout: httpx.Timeout = None,
+                          auth: httpx.Auth = None) -> httpx.AsyncClient:
+        """Transport HTTP client factory that keeps a handle on the client it makes"""
+        self.http_client = _create_http_client(headers, timeout, auth)
+        return self.http_client
+    
+    async def _handle_message(self, message) -> None:
+        """Drop cached listings when the server reports that they changed"""
+        if isinstance(message, ServerNotification):
+            if isinstance(message.root, ToolListChangedNotification):
+                self.invalidate_tools_cache()
+            elif isinstance(message.root, PromptListChangedNotification):
+                self.invalidate_prompts_cache()
+    
+    def invalidate_tools_cache(self):
+        """Force the next list_tools() call to query the server"""
+        self._tools_cache = None
+        for listener in self._tools_cache_listeners:
+            listener(self)
+    
+    def add_tools_cache_listener(self, listener: Callable[["MCPClient"], None]):
+        """Call listener(self) on connect, disconnect and tool list changes"""
+        if listener not in self._tools_cache_listeners:
+            self._tools_cache_listeners.append(listener)
+    
+    def invalidate_prompts_cache(self):
+        """Force the next list_prompts() call to query the server"""
+        self._prompts_cache = None
+    
+    def _cache_is_fresh(self, cache: Optional[Tuple[float, List[Dict[str, Any]]]]) -> bool:
+        """Check whether a cached listing is still within the TTL"""
+        return cache is not None and time.monotonic() - cache[0] < self.cache_ttl_seconds
     
     async def list_tools(self) -> List[Dict[str, Any]]:
         """List available tools from the server"""
+        if self._cache_is_fresh(self._tools_cache):
+            return list(self._tools_cache[1])
         try:
             result = await self.session.list_tools()
-            tools = []
-            for tool in result.tools:
-                tools.append({
-                    "name": tool.name,
-                    "description": tool.description,
-                    "inputSchema": tool.inputSchema
-                })
-            return tools
+            tools = [_tool_to_dict(tool) for tool in result.tools]
+            self._tools_cache = (time.monotonic(), tools)
+            return list(tools)
         except Exception as e:
-            logger.error(f"Error listing tools: {e}")
+            logger.error("Error listing tools: %s", e)
             return []
     
     async def call_tool(self, name: str, **kwargs) -> str:
         """Call a tool on the server"""
         try:
             result = await self.session.call_tool(name, kwargs)
-            
-            # Extract text content from the result
-            if result.content:
-                text_parts = []
-                for content in result.content:
-                    if hasattr(content, 'text'):
-                        text_parts.append(content.text)
-                return "\n".join(text_parts)
-            else:
-                return "No content returned"
+            return _extract_text(result.content)
                 
         except Exception as e:
-            logger.error(f"Error calling tool {name}: {e}")
+            logger.error("Error calling tool %s: %s", name, e)
             return f"Error: {str(e)}"
     
+    async def call_tools(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        """
+        Call several tools at once over the current session
+        
+        The session cannot send JSON-RPC batches, so the requests are
+        pipelined instead: all are written before any reply is awaited, and
+        replies are matched to requests by id, so N calls cost about one
+        round-trip. Only use this for calls that do not depend on each other;
+        the server may handle them in any order.
+        
+        Args:
+            calls: (tool name, arguments) pairs
+            
+        Returns:
+            Each call's text result, in the order of calls
+        """
+        return list(await asyncio.gather(*(self.call_tool(name, **arguments) for name, arguments in calls)))
+    
     async def list_prompts(self) -> List[Dict[str, Any]]:
         """List available prompts from the server"""
+        if self._cache_is_fresh(self._prompts_cache):
+            return list(self._prompts_cache[1])
         try:
             result = await self.session.list_prompts()
-            prompts = []
-            for prompt in result.prompts:
-                prompt_dict = {
-                    "name": prompt.name,
-                    "description": prompt.description,
-                    "arguments": []
-                }
-                if prompt.arguments:
-                    for arg in prompt.arguments:
-                        prompt_dict["arguments"].append({
-                            "name": arg.name,
-                            "description": arg.description,
-                            "required": arg.required
-                        })
-                prompts.append(prompt_dict)
-            return prompts
+            prompts = [_prompt_to_dict(prompt) for prompt in result.prompts]
+            self._prompts_cache = (time.monotonic(), prompts)
+            return list(prompts)
         except Exception as e:
-            logger.error(f"Error listing prompts: {e}")
+            logger.error("Error listing prompts: %s", e)
             return []
     
     async def get_prompt(self, name: str, arguments: Dict[str, str] = None) -> str:
@@ -127,12 +286,90 @@ class MCPClient():
             if result.messages:
                 message_texts = []
                 for message in result.messages:
-                    if hasattr(message.content, 'text'):
-                        message_texts.append(f"{message.role}: {message.content.text}")
+                    content = message.content
+                    if isinstance(content, TextContent):
+                        message_texts.append(f"{message.role}: {content.text}")
                 return "\n".join(message_texts)
             else:
                 return "No messages in prompt"
                 
         except Exception as e:
-            logger.error(f"Error getting prompt {name}: {e}")
+            logger.error("Error getting prompt %s: %s", name, e)
             return f"Error: {str(e)}"
+
+
+class _SharedClient(NamedTuple):
+    """A shared client and the task that holds its session open"""
+    client: MCPClient
+    owner: asyncio.Task
+    stop: asyncio.Event
+
+# Connected clients shared across callers, keyed by (server_url, transport)
+_shared_clients: Dict[Tuple[str, str], _SharedClient] = {}
+_shared_clients_lock = asyncio.Lock()
+
+async def _own_shared_client(client: MCPClient, connected: asyncio.Future, stop: asyncio.Event):
+    """
+    Connect client, keep its session open until stop is set, then disconnect
+    
+    The transport's cancel scopes must be exited by the task that entered
+    them, so connect() and disconnect() both run here rather than in
+    whichever tasks call get_shared_client and close_shared_clients.
+    """
+    try:
+        ok = await client.connect()
+    finally:
+        if not connected.done():
+            connected.set_result(client.session is not None)
+    if not ok:
+        return
+    try:
+        await stop.wait()
+    finally:
+        await client.disconnect()
+
+async def get_shared_client(server_url: str = "http://localhost:8000", transport: Literal["sse", "streamable_http"] = "sse") -> Optional[MCPClient]:
+    """
+    Connected client for server_url, shared by every caller in this process
+    
+    The first call connects and runs the MCP handshake; later calls return the
+    same client, so callers don't pay for a session of their own. The session
+    is held open by a background task on the current event loop, so any task
+    on that loop may use the client; close it with close_shared_clients()
+    rather than client.disconnect().
+    
+    Returns:
+        The shared client, or None if it could not connect
+    """
+    key = (server_url, transport)
+    shared = _shared_clients.get(key)
+    if shared is not None and shared.client.session is not None:
+        return shared.client
+    
+    async with _shared_clients_lock:
+        shared = _shared_clients.get(key)
+        if shared is None or shared.client.session is None:
+            client = MCPClient(server_url, transport=transport)
+            connected = asyncio.get_running_loop().create_future()
+            stop = asyncio.Event()
+            owner = asyncio.create_task(_own_shared_client(client, connected, stop))
+            try:
+                ok = await asyncio.shield(connected)
+            except asyncio.CancelledError:
+                # Nobody will hold this client; have the task close it again
+                stop.set()
+                raise
+            if not ok:
+                # connect() already closed what it opened; let the task finish
+                await owner
+                return None
+            shared = _shared_clients[key] = _SharedClient(client, owner, stop)
+    return shared.client
+
+async def close_shared_clients():
+    """Disconnect every client handed out by get_shared_client"""
+    shared_clients = list(_shared_clients.values())
+    _shared_clients.clear()
+    for shared in shared_clients:
+        shared.stop.set()
+    await asyncio.gather(*(shared.owner for shared in shared_clients))
@@ -8,22 +8,74 @@ This module implements a LangChain agent that:
 """
 
 import asyncio
+import functools
 import logging
-from typing import List, Optional
+import os
+import sys
+from typing import TYPE_CHECKING, List, Optional
 import json
 
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_ollama import ChatOllama
-from langchain_core.tools import BaseTool
+from cachetools import TTLCache
 
-from mcp_client import MCPClient
-from mcp_tool_wrapper import discover_mcp_tools
+# LangChain and the MCP modules are imported where they are first needed, so
+# importing this module (or starting the CLI) does not pay for them up front
+if TYPE_CHECKING:
+    from langchain_core.callbacks import AsyncCallbackHandler
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.tools import BaseTool
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# System prompt for the agent. The Ollama warmup sends the same text so the
+# model's cached prefix matches the first real query.
+_SYSTEM_PROMPT = (
+    "You are a helpful assistant with access to weather information tools. "
+    "Use the available tools to help users get weather information for different cities. "
+    "When using tools, make sure to provide clear and helpful responses based on the tool results. "
+    "If a user asks about weather in a city, use the appropriate weather tools to get the information."
+)
+
+
+# Inputs that end the interactive session
+_EXIT_COMMANDS = frozenset({'quit', 'exit', 'bye', 'q'})
+
+@functools.lru_cache(maxsize=None)
+def _get_agent_prompt() -> "ChatPromptTemplate":
+    """Agent prompt template, parsed once and shared by all hosts"""
+    from langchain_core.prompts import ChatPromptTemplate
+    
+    return ChatPromptTemplate.from_messages([
+        ("system", _SYSTEM_PROMPT),
+        ("human", "{input}"),
+        ("placeholder", "{agent_scratchpad}")
+    ])
+
+
+@functools.lru_cache(maxsize=None)
+def _get_prompt_eval_logger() -> "AsyncCallbackHandler":
+    """Shared callback that logs Ollama prompt evaluation stats"""
+    from langchain_core.callbacks import AsyncCallbackHandler
+    from langchain_core.outputs import LLMResult
+    
+    class PromptEvalLogger(AsyncCallbackHandler):
+        """Log Ollama prompt evaluation stats; a small prompt_eval_count means the cached prefix was reused"""
+        
+        async def on_llm_end(self, response: LLMResult, **kwargs):
+            for generations in response.generations:
+                for generation in generations:
+                    message = getattr(generation, "message", None)
+                    metadata = getattr(message, "response_metadata", None) or {}
+                    if "prompt_eval_count" in metadata:
+                        logger.debug(
+                            "Ollama prompt eval: %s tokens in %.1f ms",
+                            metadata["prompt_eval_count"],
+                            metadata.get("prompt_eval_duration", 0) / 1e6,
+                        )
+    
+    return PromptEvalLogger()
+
 
 class MCPLangChainHost:
     """MCP Host that integrates LangChain agents with MCP tools"""
@@ -31,7 +83,11 @@ class MCPLangChainHost:
     def __init__(self, 
                  ollama_model: str = "llama3.2:3b",
                  ollama_base_url: str = "http://localhost:11434",
-                 mcp_server_url: str = "http://localhost:8000"):
+                 mcp_server_url: str = "http://localhost:8000",
+                 tools_cache_ttl_seconds: float = 300,
+                 enable_query_cache: bool = True,
+                 query_cache_ttl_seconds: float = 300,
+                 ollama_num_ctx: int = 8192):
         """
         Initialize the MCP LangChain Host
         
@@ -39,15 +95,25 @@ class MCPLangChainHost:
             ollama_model: Name of the Ollama model to use
             ollama_base_url: Base URL for Ollama API
             mcp_server_url: URL of the MCP weather server
+            tools_cache_ttl_seconds: How long discovered MCP tools are reused
+                before the server is asked for the tool list again
+            enable_query_cache: Answer repeated queries from memory
+            query_cache_ttl_seconds: How long a cached answer stays valid
+            ollama_num_ctx: Context window size; large enough that multi-turn
+                agent runs never shift out the cached system prompt prefix
         """
         self.ollama_model = ollama_model
         self.ollama_base_url = ollama_base_url
         self.mcp_server_url = mcp_server_url
+        self.tools_cache_ttl_seconds = tools_cache_ttl_seconds
+        self.enable_query_cache = enable_query_cache
+        self.ollama_num_ctx = ollama_num_ctx
+        self._query_cache = TTLCache(maxsize=256, ttl=query_cache_ttl_seconds)
         
         # Initialize components
         self.llm = None
         self.mcp_client = None
-        self.tools: List[BaseTool] = []
+        self.tools: List["BaseTool"] = []
         self.agent_executor = None
         
     async def initialize(self) -> bool:
@@ -57,44 +123,58 @@ class MCPLangChainHost:
         Returns:
             bool: True if initialization successful, False otherwise
         """
+        from langchain_ollama import ChatOllama
+        from mcp_client import MCPClient
+        from mcp_tool_wrapper import discover_mcp_tools, set_main_loop
+        
         try:
             logger.info("Initializing MCP LangChain Host...")
             
             # Initialize Ollama LLM
-            logger.info(f"Connecting to Ollama model: {self.ollama_model}")
+            logger.info("Connecting to Ollama model: %s", self.ollama_model)
             self.llm = ChatOllama(
                 model=self.ollama_model,
                 base_url=self.ollama_base_url,
-                temperature=0.1
+                temperature=0.1,
+                keep_alive="30m",
+                num_ctx=self.ollama_num_ctx,
+                callbacks=[_get_prompt_eval_logger()]
             )
             
-            # Test LLM connection
+            # Test LLM connection and warm up the model with the agent's system
+            # prompt, once per parallel Ollama slot
             try:
-                test_response = await self.llm.ainvoke("Hello")
+                await self._warm_up_llm()
                 logger.info("Successfully connected to Ollama")
             except Exception as e:
-                logger.error(f"Failed to connect to Ollama: {e}")
+                logger.error("Failed to connect to Ollama: %s", e)
                 logger.error("Make sure Ollama is running and the model is available")
                 return False
             
             # Initialize MCP client
-            logger.info(f"Connecting to MCP server: {self.mcp_server_url}")
-            self.mcp_client = MCPClient(self.mcp_server_url)
+            logger.info("Connecting to MCP server: %s", self.mcp_server_url)
+            self.mcp_client = MCPClient(self.mcp_server_url, cache_ttl_seconds=self.tools_cache_ttl_seconds)
             
             if not await self.mcp_client.connect():
                 logger.error("Failed to connect to MCP server")
                 return False
+            set_main_loop(asyncio.get_running_loop())
             
             # Discover MCP tools
             logger.info("Discovering MCP tools...")
-            self.tools = await discover_mcp_tools(self.mcp_client)
+            self.tools = await discover_mcp_tools(
+                self.mcp_client,
+                cache=True,
+                cache_ttl_seconds=self.tools_cache_ttl_seconds,
+            )
             
             if not self.tools:
                 logger.warning("No MCP tools discovered")
-            else:
-                logger.info(f"Discovered {len(self.tools)} MCP tools:")
+            elif logger.isEnabledFor(logging.INFO):
+                # Schema dumps are built eagerly, so skip them when INFO is off
+                logger.info("Discovered %s MCP tools:", len(self.tools))
                 for tool in self.tools:
-                    logger.info(f"  - {tool.name}: {tool.description}; input_schema: {json.dumps(tool.get_input_jsonschema(), indent=2)}")
+                    logger.info("  - %s: %s; input_schema: %s", tool.name, tool.description, json.dumps(tool.get_input_jsonschema(), indent=2))
             
             # Create the agent
             await self._create_agent()
@@ -103,24 +183,23 @@ class MCPLangChainHost:
             return True
             
         except Exception as e:
-            logger.error(f"Failed to initialize MCP LangChain Host: {e}")
+            logger.error("Failed to initialize MCP LangChain Host: %s", e)
             return False
     
+    async def _warm_up_llm(self):
+        """Load the model and prefill the system prompt before the first query"""
+        from langchain_core.messages import HumanMessage, SystemMessage
+        
+        warm_messages = [SystemMessage(content=_SYSTEM_PROMPT), HumanMessage(content="ok")]
+        num_parallel = max(1, int(os.getenv("OLLAMA_NUM_PARALLEL", "1")))
+        await asyncio.gather(*(self.llm.ainvoke(warm_messages) for _ in range(num_parallel)))
+    
     async def _create_agent(self):
         """Create the LangChain agent with MCP tools"""
-        # Define the prompt template
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", 
-             "You are a helpful assistant with access to weather information tools. "
-             "Use the available tools to help users get weather information for different cities. "
-             "When using tools, make sure to provide clear and helpful responses based on the tool results. "
-             "If a user asks about weather in a city, use the appropriate weather tools to get the information."),
-            ("human", "{input}"),
-            ("placeholder", "{agent_scratchpad}")
-        ])
+        from langchain.agents import AgentExecutor, create_tool_calling_agent
         
         # Create the agent
-        agent = create_tool_calling_agent(self.llm, self.tools, prompt)
+        agent = create_tool_calling_agent(self.llm, self.tools, _get_agent_prompt())
         
         # Create the agent executor
         self.agent_executor = AgentExecutor(
@@ -128,7 +207,8 @@ class MCPLangChainHost:
             tools=self.tools,
             verbose=True,
             handle_parsing_errors=True,
-            max_iterations=5
+            max_iterations=5,
+            return_intermediate_steps=True
         )
     
     async def process_query(self, query: str) -> str:
@@ -144,21 +224,137 @@ class MCPLangChainHost:
         if not self.agent_executor:
             return "Error: Agent not initialized. Please call initialize() first."
         
+        key = query.strip().lower()
+        cached = self._get_cached_answer(key)
+        if cached is not None:
+            return cached
+        
         try:
-            logger.info(f"Processing query: {query}")
+            logger.info("Processing query: %s", query)
             result = await self.agent_executor.ainvoke({"input": query})
-            return result["output"]
+            output = result["output"]
+            if self.enable_query_cache:
+                self._cache_query_result(key, output, result.get("intermediate_steps", []))
+            return output
         except Exception as e:
-            logger.error(f"Error processing query: {e}")
+            logger.error("Error processing query: %s", e)
             return f"Error processing query: {str(e)}"
     
+    async def process_query_stream(self, query: str, flush_interval: float = 0.05) -> str:
+        """
+        Process a user query, writing the answer to stdout as it is generated
+        
+        Streamed tokens are coalesced for flush_interval seconds so the
+        terminal is not written once per token.
+        
+        Args:
+            query: User's query/prompt
+            flush_interval: Seconds to accumulate tokens between writes
+            
+        Returns:
+            str: Agent's full response
+        """
+        if not self.agent_executor:
+            response = "Error: Agent not initialized. Please call initialize() first."
+            print(response)
+            return response
+        
+        key = query.strip().lower()
+        cached = self._get_cached_answer(key)
+        if cached is not None:
+            print(cached)
+            return cached
+        
+        loop = asyncio.get_running_loop()
+        buffer: List[str] = []
+        last_flush = loop.time()
+        streamed = False
+        result = None
+        
+        def flush():
+            if buffer:
+                sys.stdout.write("".join(buffer))
+                sys.stdout.flush()
+                buffer.clear()
+        
+        try:
+            logger.info("Processing query: %s", query)
+            async for event in self.agent_executor.astream_events({"input": query}, version="v2"):
+                kind = event["event"]
+                if kind == "on_chat_model_stream":
+                    text = event["data"]["chunk"].content
+                    if text:
+                        buffer.append(text)
+                        streamed = True
+                        if loop.time() - last_flush >= flush_interval:
+                            flush()
+                            last_flush = loop.time()
+                elif kind == "on_chain_end" and not event["parent_ids"]:
+                    result = event["data"]["output"]
+        except Exception as e:
+            flush()
+            logger.error("Error processing query: %s", e)
+            response = f"Error processing query: {str(e)}"
+            print(response)
+            return response
+        
+        flush()
+        output = result["output"] if result else ""
+        if streamed:
+            print()
+        else:
+            print(output)
+        if self.enable_query_cache and result:
+            self._cache_query_result(key, output, result.get("intermediate_steps", []))
+        return output
+    
+    def _get_cached_answer(self, key: str) -> Optional[str]:
+        """Return a cached answer for a normalized query, if any"""
+        if not self.enable_query_cache:
+            return None
+        cached = self._query_cache.get(key)
+        if cached is not None:
+            logger.info("Query cache hit: %s", key)
+        return cached
+    
+    def _cache_query_result(self, key: str, output: str, steps: list):
+        """Cache an answer unless the agent used a tool that may change server state"""
+        tools_by_name = {tool.name: tool for tool in self.tools}
+        for action, _ in steps:
+            tool = tools_by_name.get(action.tool)
+            if not getattr(tool, "cache_enabled", False):
+                # Earlier answers may now be stale
+                self._query_cache.clear()
+                return
+        self._query_cache[key] = output
+    
     async def shutdown(self):
         """Shutdown the host and disconnect from MCP server"""
+        from mcp_tool_wrapper import invalidate_tools_cache
+        
         logger.info("Shutting down MCP LangChain Host...")
         if self.mcp_client:
+            invalidate_tools_cache(self.mcp_client)
             await self.mcp_client.disconnect()
         logger.info("Shutdown complete")
     
+    async def _refresh_tools_periodically(self):
+        """Rediscover MCP tools each time the cached list expires and rebuild the agent on change"""
+        from mcp_tool_wrapper import discover_mcp_tools
+        
+        while True:
+            await asyncio.sleep(self.tools_cache_ttl_seconds)
+            tools = await discover_mcp_tools(
+                self.mcp_client,
+                cache=True,
+                cache_ttl_seconds=self.tools_cache_ttl_seconds,
+            )
+            # An empty list means discovery failed; keep the current tools
+            if tools and [tool.name for tool in tools] != [tool.name for tool in self.tools]:
+                logger.info("MCP tool list changed, now %s tools", len(tools))
+                self.tools = tools
+                await self._create_agent()
+    
     async def interactive_session(self):
         """Run an interactive session with the agent"""
         print("\n" + "=" * 60)
@@ -168,22 +364,32 @@ class MCPLangChainHost:
         print("Type 'quit', 'exit', or 'bye' to end the session.")
         print("=" * 60 + "\n")
         
+        # Input no longer blocks the loop, so tool refreshes can run meanwhile
+        refresh_task = asyncio.create_task(self._refresh_tools_periodically())
+        try:
+            await self._run_prompt_loop()
+        finally:
+            refresh_task.cancel()
+    
+    async def _run_prompt_loop(self):
+        """Read user queries until the user quits"""
+        from aioconsole import ainput
+        
         while True:
             try:
-                user_input = input("\nYou: ").strip()
+                user_input = (await ainput("\nYou: ")).strip()
                 
-                if user_input.lower() in ['quit', 'exit', 'bye', 'q']:
+                if user_input.lower() in _EXIT_COMMANDS:
                     print("\nGoodbye!")
                     break
                 
                 if not user_input:
                     continue
                 
-                print("\nAgent: ", end="")
-                response = await self.process_query(user_input)
-                print(response)
+                print("\nAgent: ", end="", flush=True)
+                await self.process_query_stream(user_input)
                 
-            except KeyboardInterrupt:
+            except (KeyboardInterrupt, EOFError):
                 print("\n\nSession interrupted. Goodbye!")
                 break
             except Exception as e:
@@ -217,32 +423,44 @@ async def demo_queries():
             print("Failed to initialize MCP LangChain Host")
             return
         
-        # Example queries
-        queries = [
-            "What's the weather like in New York?",
-            "Can you tell me about the weather in London?",
-            "What cities do you have weather information for?",
-            "Update the weather for Paris to be sunny with 75°F temperature and 60% humidity",
-            "What's the weather in Paris now?"
+        # Example queries, grouped into stages. Queries within a stage are
+        # independent and run concurrently (set OLLAMA_NUM_PARALLEL to let
+        # Ollama serve them in parallel); each stage waits for the previous
+        # one, since the Paris read depends on the Paris update.
+        stages = [
+            [
+                "What's the weather like in New York?",
+                "Can you tell me about the weather in London?",
+                "What cities do you have weather information for?",
+            ],
+            ["Update the weather for Paris to be sunny with 75°F temperature and 60% humidity"],
+            ["What's the weather in Paris now?"],
         ]
         
         print("\n" + "=" * 50)
         print("MCP LangChain Agent - Demo Queries")
         print("=" * 50)
         
-        for i, query in enumerate(queries, 1):
-            print(f"\n{i}. Query: {query}")
-            print("-" * 40)
-            response = await host.process_query(query)
-            print(f"Response: {response}")
-            print()
+        i = 0
+        for queries in stages:
+            responses = await asyncio.gather(*(host.process_query(query) for query in queries))
+            for query, response in zip(queries, responses):
+                i += 1
+                print(f"\n{i}. Query: {query}")
+                print("-" * 40)
+                print(f"Response: {response}")
+                print()
         
     finally:
         await host.shutdown()
 
 
 if __name__ == "__main__":
-    import sys
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
     
     if len(sys.argv) > 1 and sys.argv[1] == "demo":
         # Run demo queries
@@ -5,59 +5,143 @@ This module provides a wrapper that allows MCP tools to be used as LangChain too
 """
 
 import asyncio
-from typing import Any, Dict, List, Optional, Type
-from pydantic import BaseModel, Field, create_model
+import functools
+import json
+import os
+import threading
+import time
+from typing import Any, ClassVar, Dict, List, Optional, Tuple, Type, Union
+from cachetools import TTLCache
+from pydantic import BaseModel, Field, PrivateAttr, create_model
 from langchain_core.tools import BaseTool
 from langchain_core.callbacks import CallbackManagerForToolRun
 from typing import override
 import logging
 from mcp_client import MCPClient
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# Event loop that owns the MCP sessions, used by synchronous tool calls
+_MAIN_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+# Default lifetime of a cached tool listing, in seconds
+_TOOLS_CACHE_TTL = 300
+
+# Maximum number of distinct argument sets cached, and their default lifetime
+_RESULT_CACHE_SIZE = 256
+_RESULT_CACHE_TTL = 60
+
+# Set on an in-flight call's future when the caller that made the call is
+# cancelled, telling callers that joined it to make the call themselves
+_CALL_CANCELLED = object()
+
+# Cache key for one tool call: (tool name, canonical JSON of the arguments)
+CallKey = Tuple[str, Union[bytes, str]]
+
+
+def _call_key(name: str, kwargs: Dict[str, Any]) -> CallKey:
+    """Build the result cache key for a tool call"""
+    if orjson is not None:
+        try:
+            # Nested dicts from tool arguments may have int or other non-str keys
+            return (name, orjson.dumps(kwargs, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str))
+        except TypeError:
+            # e.g. integers beyond 64 bits; the stdlib encoder handles those
+            pass
+    return (name, json.dumps(kwargs, sort_keys=True, default=str))
+
+
+# JSON schema type names mapped to the Python types used in args models
+_TYPE_MAPPING = {
+    'string': str,
+    'str': str,
+    'integer': int,
+    'int': int,
+    'number': float,
+    'float': float,
+    'boolean': bool,
+    'bool': bool,
+    'list': list,
+    'array': list,
+    'dict': dict,
+    'object': dict,
+    'any': Any,
+}
+
+# A hashable view of a tool's input properties:
+# (name, type, array item type or None, default, description)
+SchemaKey = Tuple[Tuple[str, str, Optional[str], Any, str], ...]
+
+
+def _schema_key(tool_config: Dict[str, Any]) -> SchemaKey:
+    """Reduce a tool's input schema to the fields the args model is built from"""
+    return tuple(
+        (
+            field_name,
+            field_config.get('type', 'str'),
+            (field_config.get('items') or {}).get('type'),
+            field_config.get('default', ...),
+            field_config.get('description', 'No description provided'),
+        )
+        for field_name, field_config in tool_config['inputSchema']['properties'].items()
+    )
+
+
+@functools.lru_cache(maxsize=512)
+def _build_args_model(name: str, schema_key: SchemaKey) -> Type[BaseModel]:
+    """Create a Pydantic input model, shared by every tool with the same schema."""
+    fields = {}
+    for field_name, field_type_name, item_type_name, default, description in schema_key:
+        field_type = _TYPE_MAPPING.get(field_type_name, str)
+        if field_type is list and item_type_name in _TYPE_MAPPING:
+            # Keep the element type so the schema shown to the LLM says what to pass
+            field_type = List[_TYPE_MAPPING[item_type_name]]
+        if default == ...:
+            fields[field_name] = (field_type, Field(description=description))
+        else:
+            fields[field_name] = (field_type, Field(default=default, description=description))
+    
+    return create_model(name, **fields)
+
+
+def _get_tool_base_model(tool_config: Dict[str, Any]) -> Type[BaseModel]:
+    """Create a Pydantic input model from the input schema."""
+    key = _schema_key(tool_config)
+    try:
+        return _build_args_model(tool_config['name'], key)
+    except TypeError:
+        # Unhashable defaults (lists, dicts) cannot be cached
+        return _build_args_model.__wrapped__(tool_config['name'], key)
+
+
 class MCPToolWrapper(BaseTool):
     """LangChain tool wrapper for MCP tools"""
     
     name: str = Field(..., description="Name of the MCP tool")
     description: str = Field(..., description="Description of the MCP tool")
     mcp_client: MCPClient = Field(..., description="MCP client instance")
+    cache_enabled: bool = Field(False, description="Serve repeat calls with identical arguments from memory")
+    cache_ttl: int = Field(_RESULT_CACHE_TTL, description="Seconds a cached tool result stays valid")
+
+    # Upper bound on concurrent MCP calls issued by batch_arun
+    max_concurrency: ClassVar[int] = int(os.getenv("MCP_TOOL_CONCURRENCY", "10"))
+
+    _result_cache: Optional[TTLCache] = PrivateAttr(default=None)
+    _cache_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _inflight: Dict[CallKey, asyncio.Future] = PrivateAttr(default_factory=dict)
 
     def __init__(self, tool_config: Dict[str, Any], **kwargs):
-        args_schema = self._get_tool_base_model(tool_config)
+        args_schema = _get_tool_base_model(tool_config)
+        # Only tools the server marks read-only are safe to answer from the
+        # result cache, unless the caller says otherwise
+        kwargs.setdefault('cache_enabled', _is_read_only(tool_config))
         super().__init__(args_schema=args_schema, **kwargs)
     
-    def _get_tool_base_model(self, tool_config: Dict[str, Any]) -> Type[BaseModel]:
-        """Create a Pydantic input model from the input schema."""
-        fields = {}
-        
-        type_mapping = {
-            'string': str,
-            'str': str,
-            'integer': int,
-            'int': int,
-            'number': float,
-            'float': float,
-            'boolean': bool,
-            'bool': bool,
-            'list': list,
-            'array': list,
-            'dict': dict,
-            'object': dict,
-            'any': Any,
-        }
-
-        for field_name, field_config in tool_config['inputSchema']['properties'].items():
-            field_type = type_mapping.get(field_config.get('type', 'str'), str)
-            default = field_config.get('default', ...)
-            description = field_config.get('description', 'No description provided')
-            
-            if default == ...:
-                fields[field_name] = (field_type, Field(description=description))
-            else:
-                fields[field_name] = (field_type, Field(default=default, description=description))
-        
-        return create_model(tool_config['name'], **fields)
-    
     class Config:
         arbitrary_types_allowed = True
 
@@ -68,22 +152,20 @@ class MCPToolWrapper(BaseTool):
         **kwargs,
     ) -> str:
         """Synchronous wrapper for the async MCP tool call"""
-        # Run the async call in a new event loop or existing one
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                # If we're already in an async context, we need to handle this differently
-                # For now, we'll use a simple approach - in production you might want
-                # to use asyncio.create_task() or similar
-                import concurrent.futures
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(asyncio.run, self._async_run(arguments))
-                    return future.result()
-            else:
-                return asyncio.run(self._async_run(arguments))
-        except RuntimeError:
-            # No event loop running, create a new one
-            return asyncio.run(self._async_run(arguments))
+        loop = _MAIN_LOOP
+        running_loop = _get_running_loop()
+        
+        if loop is not None and loop.is_running() and running_loop is not loop:
+            # The MCP session belongs to the main loop, so run the call there
+            # and keep its connection and caches
+            return asyncio.run_coroutine_threadsafe(self._async_run(**kwargs), loop).result()
+        if running_loop is None:
+            return asyncio.run(self._async_run(**kwargs))
+        # Blocking here would deadlock the loop the call needs to run on
+        raise RuntimeError(
+            f"MCP tool {self.name} cannot be run synchronously from inside a running "
+            "event loop; use ainvoke() instead"
+        )
     
     @override
     async def _arun(
@@ -97,40 +179,212 @@ class MCPToolWrapper(BaseTool):
 
     async def _async_run(self, **kwargs) -> str:
         """Async implementation of the tool call"""
+        nocache = kwargs.pop("_nocache", False)
+        use_cache = self.cache_enabled and not nocache
+        
+        future = None
+        
+        if use_cache:
+            key = _call_key(self.name, kwargs)
+            with self._cache_lock:
+                cached = self._get_result_cache().get(key)
+            if cached is not None:
+                return cached
+            
+            # Join an identical call that is already on the wire
+            loop = asyncio.get_running_loop()
+            pending = self._inflight.get(key)
+            if pending is not None and pending.get_loop() is loop:
+                result = await asyncio.shield(pending)
+                if result is not _CALL_CANCELLED:
+                    return result
+                # The call we joined was cancelled under its owner; retry it
+                return await self._async_run(**kwargs)
+            future = loop.create_future()
+            self._inflight[key] = future
+        
         try:
             result = await self.mcp_client.call_tool(self.name, **kwargs)
-            return result
+        except asyncio.CancelledError:
+            if future is not None:
+                self._inflight.pop(key, None)
+                future.set_result(_CALL_CANCELLED)
+            raise
         except Exception as e:
-            return f"Error calling MCP tool {self.name}: {str(e)}"
+            result = f"Error calling MCP tool {self.name}: {str(e)}"
+        
+        if future is not None:
+            # MCPClient reports failures as "Error..." strings; never cache those
+            if not result.startswith("Error"):
+                with self._cache_lock:
+                    self._get_result_cache()[key] = result
+            self._inflight.pop(key, None)
+            future.set_result(result)
+        elif not self.cache_enabled:
+            # A tool that may change server state makes cached reads stale
+            self.invalidate()
+        return result
+    
+    async def batch_arun(self, calls: List[Dict[str, Any]]) -> List[str]:
+        """
+        Run several independent calls of this tool concurrently.
+        
+        Args:
+            calls: Keyword arguments for each call
+            
+        Returns:
+            Results in the same order as calls
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def run_one(kwargs: Dict[str, Any]) -> str:
+            async with semaphore:
+                return await self._async_run(**kwargs)
+        
+        return await asyncio.gather(*(run_one(dict(kwargs)) for kwargs in calls))
+    
+    def _get_result_cache(self) -> TTLCache:
+        """Return the result cache, creating it on first use"""
+        if self._result_cache is None:
+            self._result_cache = TTLCache(maxsize=_RESULT_CACHE_SIZE, ttl=self.cache_ttl)
+        return self._result_cache
+    
+    def invalidate(self) -> None:
+        """Drop all cached results for this tool and any tools sharing its cache"""
+        with self._cache_lock:
+            if self._result_cache is not None:
+                self._result_cache.clear()
 
-async def discover_mcp_tools(mcp_client: MCPClient) -> List[MCPToolWrapper]:
+def _get_running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    """Return the loop running in this thread, or None without the deprecated get_event_loop()"""
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def set_main_loop(loop: Optional[asyncio.AbstractEventLoop]) -> None:
+    """
+    Register the event loop that owns the MCP client sessions.
+    
+    Synchronous tool calls made from other threads are scheduled onto this
+    loop instead of a fresh one, so they reuse its connections and caches.
+    """
+    global _MAIN_LOOP
+    _MAIN_LOOP = loop
+
+
+# Discovered wrappers keyed by (client identity, server url), stored with the
+# monotonic time at which they were fetched
+_TOOLS_CACHE: Dict[Tuple[int, str], Tuple[float, List[MCPToolWrapper]]] = {}
+
+
+def _tools_cache_key(mcp_client: MCPClient) -> Tuple[int, str]:
+    """Build the discovery cache key for a client"""
+    return (id(mcp_client), getattr(mcp_client, "server_url", ""))
+
+
+def invalidate_tools_cache(mcp_client: Optional[MCPClient] = None) -> None:
+    """
+    Drop cached tool listings.
+    
+    Args:
+        mcp_client: Client whose cached tools should be dropped. If None, the
+            whole cache is cleared.
+    """
+    if mcp_client is None:
+        _TOOLS_CACHE.clear()
+    else:
+        _TOOLS_CACHE.pop(_tools_cache_key(mcp_client), None)
+
+
+def _is_read_only(tool_info: Dict[str, Any]) -> bool:
+    """Whether the server marks a tool as not changing its state"""
+    annotations = tool_info.get('annotations') or {}
+    return bool(annotations.get('readOnlyHint', False))
+
+
+def _wrap_tool(
+    tool_info: Dict[str, Any],
+    mcp_client: MCPClient,
+    validate: bool,
+    cache_ttl: int = _RESULT_CACHE_TTL,
+) -> MCPToolWrapper:
+    """Create a LangChain tool wrapper for one tool listed by the MCP server"""
+    fields = {
+        'name': tool_info['name'],
+        # MCP allows tools without a description; BaseTool requires a string
+        'description': tool_info['description'] or "",
+        'mcp_client': mcp_client,
+        'cache_enabled': _is_read_only(tool_info),
+        'cache_ttl': cache_ttl,
+    }
+    if validate:
+        return MCPToolWrapper(tool_config=tool_info, **fields)
+    return MCPToolWrapper.model_construct(args_schema=_get_tool_base_model(tool_info), **fields)
+
+
+async def discover_mcp_tools(
+    mcp_client: MCPClient,
+    cache: bool = True,
+    cache_ttl_seconds: float = _TOOLS_CACHE_TTL,
+    result_cache_ttl_seconds: int = _RESULT_CACHE_TTL,
+) -> List[MCPToolWrapper]:
     """
     Discover available tools from an MCP client and return them as LangChain tools.
     
     Args:
         mcp_client: Connected MCP client instance
+        cache: Reuse wrappers discovered for this client within the TTL
+            instead of calling list_tools() again
+        cache_ttl_seconds: How long cached wrappers stay valid
+        result_cache_ttl_seconds: How long the wrappers' cached tool results
+            stay valid
         
     Returns:
         List of MCPToolWrapper instances for each available tool
     """
+    key = _tools_cache_key(mcp_client)
+    if cache:
+        cached = _TOOLS_CACHE.get(key)
+        if cached is not None and time.monotonic() - cached[0] < cache_ttl_seconds:
+            return list(cached[1])
+    
     tools = []
+    # Wrappers for one client share a result cache and in-flight map (keys
+    # include the tool name) so that a state-changing tool can invalidate
+    # every cached read
+    result_cache = TTLCache(maxsize=_RESULT_CACHE_SIZE, ttl=result_cache_ttl_seconds)
+    cache_lock = threading.Lock()
+    inflight: Dict[CallKey, asyncio.Future] = {}
     
     try:
         # Get the list of available tools from the MCP server
         available_tools = await mcp_client.list_tools()
         
-        for tool_info in available_tools:
-            # Create a LangChain tool wrapper for each MCP tool
-            wrapper = MCPToolWrapper(
-                tool_config=tool_info,
-                name=tool_info['name'],
-                description=tool_info['description'],
-                mcp_client=mcp_client,
-            )
-            tools.append(wrapper)
+        # The first wrapper goes through full validation, which checks that
+        # this server's tool metadata has the expected shape. The rest of the
+        # same ListTools response (already parsed into mcp Tool models) is
+        # trusted and built with model_construct to skip re-validation.
+        tools = [
+            _wrap_tool(tool_info, mcp_client, validate=(i == 0), cache_ttl=result_cache_ttl_seconds)
+            for i, tool_info in enumerate(available_tools)
+        ]
+        for wrapper in tools:
+            wrapper._result_cache = result_cache
+            wrapper._cache_lock = cache_lock
+            wrapper._inflight = inflight
             
     except Exception as e:
        logger.exception("Error discovering MCP tools")
+       return tools
+    
+    # MCPClient reports listing failures as an empty list; caching that would
+    # hide the server's tools for the whole TTL
+    if cache and tools:
+        _TOOLS_CACHE[key] = (time.monotonic(), list(tools))
+        # Drop these wrappers whenever the client reconnects or its tools change
+        mcp_client.add_tools_cache_listener(invalidate_tools_cache)
         
     return tools
 
@@ -145,18 +399,14 @@ def create_mcp_tool_from_client(mcp_client: MCPClient) -> List[MCPToolWrapper]:
     Returns:
         List of MCPToolWrapper instances
     """
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # If we're in an async context, we need to handle this carefully
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(asyncio.run, discover_mcp_tools(mcp_client))
-                return future.result()
-        else:
-            return asyncio.run(discover_mcp_tools(mcp_client))
-    except RuntimeError:
+    if _get_running_loop() is None:
         return asyncio.run(discover_mcp_tools(mcp_client))
+    # The client's streams belong to the running loop, which would stay
+    # blocked while another loop waited on them
+    raise RuntimeError(
+        "create_mcp_tool_from_client cannot be called from inside a running "
+        "event loop; await discover_mcp_tools() instead"
+    )
 
 
 # Example usage function
@@ -175,19 +425,31 @@ async def example_usage():
         # Discover available tools
         tools = await discover_mcp_tools(client)
         
-        logger.info(f"Discovered {len(tools)} MCP tools:")
+        logger.info("Discovered %s MCP tools:", len(tools))
         for tool in tools:
-            logger.info(f"- {tool.name}: {tool.description}")
+            logger.info("- %s: %s", tool.name, tool.description)
         
-        # Example: Use a tool
-        if tools:
-            weather_tool = tools[0]  # Assuming first tool is weather
-            result = await weather_tool._arun("San Francisco")
-            logger.info(f"Weather result: {result}")
+        # Example: Use the tools. The calls are independent, so send them
+        # together over the one MCP session instead of one after another.
+        tools_by_name = {tool.name: tool for tool in tools}
+        if "get_weather_tool" in tools_by_name and "list_cities_tool" in tools_by_name:
+            cities, new_york, london = await asyncio.gather(
+                tools_by_name["list_cities_tool"]._arun(),
+                tools_by_name["get_weather_tool"]._arun(city="New York"),
+                tools_by_name["get_weather_tool"]._arun(city="London"),
+            )
+            logger.info("Cities result: %s", cities)
+            logger.info("Weather results: %s; %s", new_york, london)
             
     finally:
         await client.disconnect()
 
 
 if __name__ == "__main__":
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    
     asyncio.run(example_usage())
\ No newline at end of file
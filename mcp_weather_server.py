@@ -2,93 +2,196 @@
 # File: mcp_sse_server.py
 
 import asyncio
-import json
+import functools
 import logging
-from datetime import datetime
-from typing import Any, Dict, List, Optional
-from contextlib import asynccontextmanager
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional
 
 from mcp.server.fastmcp import FastMCP
+from mcp.types import ToolAnnotations
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@dataclass(slots=True)
+class WeatherRecord:
+    """Current weather for one city"""
+    temp: float
+    humidity: int
+    condition: str
+    display: str
+
 # Weather data storage
-weather_data = {
-    "new_york": {"temp": 72, "humidity": 65, "condition": "partly_cloudy"},
-    "london": {"temp": 59, "humidity": 78, "condition": "rainy"},
-    "tokyo": {"temp": 68, "humidity": 82, "condition": "sunny"},
-    "sydney": {"temp": 75, "humidity": 60, "condition": "clear"}
+weather_data: Dict[str, WeatherRecord] = {
+    "new_york": WeatherRecord(temp=72, humidity=65, condition="partly_cloudy", display="New York"),
+    "london": WeatherRecord(temp=59, humidity=78, condition="rainy", display="London"),
+    "tokyo": WeatherRecord(temp=68, humidity=82, condition="sunny", display="Tokyo"),
+    "sydney": WeatherRecord(temp=75, humidity=60, condition="clear", display="Sydney")
 }
 
+_KEY_TABLE = str.maketrans(" ", "_")
+
+@functools.lru_cache(maxsize=1024)
+def _normalize_key(raw: str) -> str:
+    """Canonical key for a city or condition as clients spell it ("New York" -> "new_york")"""
+    return raw.lower().translate(_KEY_TABLE)
+
+def _display_name(city: str) -> str:
+    """Title-cased display form of a normalized city key"""
+    record = weather_data.get(city)
+    return record.display if record is not None else city.replace("_", " ").title()
+
+@functools.lru_cache(maxsize=1024)
+def _display_condition(condition: str) -> str:
+    """Display form of a normalized condition key ("partly_cloudy" -> "partly cloudy")"""
+    return condition.replace("_", " ")
+
+# Rendered get_weather responses per city, dropped when the city is updated
+_weather_text_cache: Dict[str, str] = {}
+
+# Comma-separated display names of all cities, rebuilt after a city is added
+_city_list_text: Optional[str] = None
+
+def _city_list() -> str:
+    """Display names of all cities, joined for responses"""
+    global _city_list_text
+    if _city_list_text is None:
+        _city_list_text = ", ".join(record.display for record in weather_data.values())
+    return _city_list_text
+
 def get_weather(city: str) -> str:
     """Get weather for a city"""
-    city = city.lower().replace(" ", "_")
+    city = _normalize_key(city)
+    cached = _weather_text_cache.get(city)
+    if cached is not None:
+        return cached
     if city in weather_data:
         data = weather_data[city]
-        return f"Weather in {city.replace('_', ' ').title()}: {data['temp']}°F, {data['humidity']}% humidity, {data['condition'].replace('_', ' ')}"
+        text = f"Weather in {data.display}: {data.temp}°F, {data.humidity}% humidity, {_display_condition(data.condition)}"
+        _weather_text_cache[city] = text
+        return text
     else:
-        available_cities = ", ".join([c.replace("_", " ").title() for c in weather_data.keys()])
-        return f"Weather data not available for {city.replace('_', ' ').title()}. Available cities: {available_cities}"
+        return f"Weather data not available for {_display_name(city)}. Available cities: {_city_list()}"
+
+# Typical humidity per normalized condition, used when a client sets weather
+_HUMIDITY_MAP: Dict[str, int] = {
+    "sunny": 45, "clear": 40, "partly_cloudy": 60,
+    "cloudy": 70, "rainy": 85, "stormy": 90
+}
 
 def set_weather(city: str, temperature: float, condition: str) -> str:
     """Set weather for a city"""
-    city = city.lower().replace(" ", "_")
-    condition = condition.lower().replace(" ", "_")
+    global _city_list_text
+    city = _normalize_key(city)
+    condition = _normalize_key(condition)
     
     # Calculate a reasonable humidity based on condition
-    humidity_map = {
-        "sunny": 45, "clear": 40, "partly_cloudy": 60,
-        "cloudy": 70, "rainy": 85, "stormy": 90
-    }
-    humidity = humidity_map.get(condition, 60)
+    humidity = _HUMIDITY_MAP.get(condition, 60)
     
-    weather_data[city] = {
-        "temp": temperature,
-        "humidity": humidity,
-        "condition": condition
-    }
+    previous = weather_data.get(city)
+    if previous is None:
+        # New city: the cached city list no longer covers every city
+        display = city.replace("_", " ").title()
+        _city_list_text = None
+    else:
+        display = previous.display
+    weather_data[city] = WeatherRecord(temp=temperature, humidity=humidity, condition=condition, display=display)
+    _weather_text_cache.pop(city, None)
     
-    return f"Weather updated for {city.replace('_', ' ').title()}: {temperature}°F, {humidity}% humidity, {condition.replace('_', ' ')}"
+    return f"Weather updated for {display}: {temperature}°F, {humidity}% humidity, {_display_condition(condition)}"
+
+def get_weather_multi(cities: List[str]) -> str:
+    """Get weather for several cities, one line per city in request order"""
+    return "\n".join([get_weather(city) for city in cities])
 
 def list_cities() -> str:
     """List all available cities"""
-    cities = [city.replace("_", " ").title() for city in weather_data.keys()]
-    return f"Available cities: {', '.join(cities)}"
+    return f"Available cities: {_city_list()}"
+
+class CachedToolsFastMCP(FastMCP):
+    """
+    FastMCP server that builds its ListTools response once.
+    
+    FastMCP converts every registered tool into an mcp Tool descriptor on each
+    ListTools request. The descriptors only change when a tool is added or
+    removed, so they are built on first request and shared afterwards;
+    callers must treat the returned list as read-only.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        self._tools_response = None
+        super().__init__(*args, **kwargs)
+    
+    def add_tool(self, *args, **kwargs):
+        self._tools_response = None
+        return super().add_tool(*args, **kwargs)
+    
+    # FastMCP.remove_tool only exists in newer mcp releases
+    if hasattr(FastMCP, "remove_tool"):
+        def remove_tool(self, *args, **kwargs):
+            self._tools_response = None
+            return super().remove_tool(*args, **kwargs)
+    
+    async def list_tools(self):
+        if self._tools_response is None:
+            self._tools_response = await super().list_tools()
+        return self._tools_response
 
 # Create FastMCP server instance
-mcp_server = FastMCP("weather-server")
+mcp_server = CachedToolsFastMCP("weather-server")
 
 # Register tools with FastMCP server
-@mcp_server.tool()
+@mcp_server.tool(annotations=ToolAnnotations(readOnlyHint=True))
 def get_weather_tool(city: str) -> str:
     """Get current weather for a city"""
     return get_weather(city)
 
+@mcp_server.tool(annotations=ToolAnnotations(readOnlyHint=True))
+def get_weather_multi_tool(cities: List[str]) -> str:
+    """Get current weather for several cities in one call"""
+    return get_weather_multi(cities)
+
 @mcp_server.tool()
 def set_weather_tool(city: str, temperature: float, condition: str) -> str:
     """Set weather for a city"""
     return set_weather(city, temperature, condition)
 
-@mcp_server.tool()
+@mcp_server.tool(annotations=ToolAnnotations(readOnlyHint=True))
 def list_cities_tool() -> str:
     """List all available cities"""
     return list_cities()
 
 if __name__ == "__main__":
-    # Run FastMCP server directly with SSE transport
-    print("Starting FastMCP Weather Server with SSE transport...")
+    # Run FastMCP server directly. SSE is the default; set
+    # MCP_TRANSPORT=streamable-http to serve Streamable HTTP on /mcp instead.
+    transport = os.getenv("MCP_TRANSPORT", "sse")
+    endpoint = "http://localhost:8000/mcp" if transport == "streamable-http" else "http://localhost:8000/sse"
+    
+    print(f"Starting FastMCP Weather Server with {transport} transport...")
     print("MCP Tools available:")
     print("  - get_weather_tool(city)")
+    print("  - get_weather_multi_tool(cities)")
     print("  - set_weather_tool(city, temperature, condition)")
     print("  - list_cities_tool()")
     print("")
     print("Server endpoints:")
-    print("  - MCP SSE: http://localhost:8000/sse")
+    print(f"  - MCP {transport}: {endpoint}")
     print("  - Health: Use MCP client to check server status")
     print("")
-    print("Connect MCP client to: http://localhost:8000/sse")
+    print(f"Connect MCP client to: {endpoint}")
+    
+    # FastMCP starts its loop through anyio and runs uvicorn on it, so
+    # installing the uvloop policy here puts the whole server on uvloop
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    
+    # Build the ListTools response now so the first client gets it from cache
+    asyncio.run(mcp_server.list_tools())
     
-    # Run FastMCP server with SSE transport (defaults to localhost:8000)
-    mcp_server.run(transport="sse")
\ No newline at end of file
+    # Run FastMCP server (defaults to localhost:8000)
+    mcp_server.run(transport=transport)
\ No newline at end of file
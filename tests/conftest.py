@@ -0,0 +1,74 @@
+"""
+Shared fixtures for the MCP test suite.
+
+Every test uses one connected MCPClient for the whole session, so the MCP
+initialize handshake is paid once rather than once per test. pytest.ini
+runs every async test and fixture on one session event loop, because the
+client's transport is bound to the loop it was opened on.
+
+Prerequisites:
+- MCP weather server should be running on http://localhost:8000
+- Run: python mcp_weather_server.py (in a separate terminal)
+"""
+
+import asyncio
+import socket
+from urllib.parse import urlsplit
+
+import pytest
+import pytest_asyncio
+
+from mcp_client import close_shared_clients, get_shared_client
+
+SERVER_URL = "http://localhost:8000"
+
+
+def _server_reachable(timeout: float = 0.25) -> bool:
+    """Whether anything accepts TCP connections at SERVER_URL"""
+    url = urlsplit(SERVER_URL)
+    try:
+        with socket.create_connection((url.hostname, url.port or 80), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def pytest_collection_modifyitems(items):
+    """Skip the whole suite at once when the server isn't listening"""
+    if items and not _server_reachable():
+        offline = pytest.mark.skip(reason=f"MCP server offline at {SERVER_URL}. Start it with: python mcp_weather_server.py")
+        for item in items:
+            item.add_marker(offline)
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def connection_status():
+    """Connect the shared client once per session; yields (client, connected)"""
+    client = await get_shared_client(SERVER_URL)
+
+    yield client, client is not None
+
+    await close_shared_clients()
+    # disconnect() logs errors instead of raising; a session left open means it failed
+    if client is not None:
+        assert client.session is None, "Shared client failed to disconnect cleanly"
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def client(connection_status):
+    """Connected client shared by all tests (requires server)"""
+    client, connected = connection_status
+    if not connected:
+        pytest.skip(f"Could not connect to MCP server at {SERVER_URL}. Make sure the server is running.")
+
+    # Fill the client's tool-list cache so tests listing tools read it locally,
+    # and make one tool call so first-call setup doesn't land in a test
+    await asyncio.gather(client.list_tools(), client.call_tool("list_cities_tool"))
+
+    return client
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def tools(client):
+    """Tool listing from the shared client, fetched once per session"""
+    return await client.list_tools()
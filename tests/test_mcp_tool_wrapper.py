@@ -5,11 +5,12 @@ This module tests the MCPToolWrapper class and related functions that provide
 LangChain integration for MCP tools.
 """
 
+import asyncio
 import pytest
 from typing import Dict, Any, List
 
 # Import the modules we're testing
-from mcp_tool_wrapper import MCPToolWrapper, discover_mcp_tools
+from mcp_tool_wrapper import MCPToolWrapper, _call_key, discover_mcp_tools, invalidate_tools_cache
 from mcp_client import MCPClient
 
 
@@ -17,19 +18,7 @@ class TestMCPToolWrapper:
     """Test suite for MCPToolWrapper class"""
     
     @pytest.fixture
-    async def real_client(self):
-        """Create a real MCP client for testing (requires server)"""
-        client = MCPClient("http://localhost:8000")
-        connected = await client.connect()
-        if not connected:
-            pytest.skip("Could not connect to MCP server at http://localhost:8000. Make sure the server is running.")
-        
-        yield client
-        
-        await client.disconnect()
-    
-    @pytest.fixture
-    async def weather_tool_wrapper(self, real_client):
+    async def weather_tool_wrapper(self, client):
         """Create a weather tool wrapper for testing"""
         tool_config = {
             "name": "get_weather_tool",
@@ -46,11 +35,19 @@ class TestMCPToolWrapper:
             tool_config=tool_config,
             name="get_weather_tool",
             description="Get current weather for a city",
-            mcp_client=real_client
+            mcp_client=client
         )
     
+    def test_call_key_accepts_non_str_keys(self):
+        """Test that arguments with non-string dict keys still get a stable cache key"""
+        first = _call_key("get_weather_tool", {"readings": {1: "a", 2: "b"}, "city": "london"})
+        second = _call_key("get_weather_tool", {"city": "london", "readings": {2: "b", 1: "a"}})
+        
+        assert first == second
+        assert _call_key("get_weather_tool", {"big": 2 ** 70}) != _call_key("get_weather_tool", {"big": 2 ** 71})
+    
     @pytest.mark.asyncio
-    async def test_tool_wrapper_creation(self, real_client):
+    async def test_tool_wrapper_creation(self, client):
         """Test that we can create a tool wrapper"""
         tool_config = {
             "name": "get_weather_tool",
@@ -73,33 +70,21 @@ class TestMCPToolWrapper:
             tool_config=tool_config,
             name="test_tool",
             description="Test tool",
-            mcp_client=real_client
+            mcp_client=client
         )
         
         assert wrapper.name == "test_tool"
         assert wrapper.description == "Test tool"
-        assert wrapper.mcp_client == real_client
+        assert wrapper.mcp_client == client
 
 
 class TestToolDiscovery:
     """Test suite for tool discovery functions"""
     
-    @pytest.fixture
-    async def real_client(self):
-        """Create a real MCP client for testing (requires server)"""
-        client = MCPClient("http://localhost:8000")
-        connected = await client.connect()
-        if not connected:
-            pytest.skip("Could not connect to MCP server at http://localhost:8000. Make sure the server is running.")
-        
-        yield client
-        
-        await client.disconnect()
-    
     @pytest.mark.asyncio
-    async def test_discover_mcp_tools(self, real_client):
+    async def test_discover_mcp_tools(self, client):
         """Test discovering tools from MCP client"""
-        tools = await discover_mcp_tools(real_client)
+        tools = await discover_mcp_tools(client)
         
         assert len(tools) >= 3  # Should have at least our 3 weather tools
         assert all(isinstance(tool, MCPToolWrapper) for tool in tools)
@@ -110,9 +95,50 @@ class TestToolDiscovery:
         assert "list_cities_tool" in tool_names
     
     @pytest.mark.asyncio
-    async def test_discovered_tools_are_functional(self, real_client):
+    async def test_discover_mcp_tools_uses_cache(self, client):
+        """Test that repeat discovery reuses cached wrappers until invalidated"""
+        first = await discover_mcp_tools(client)
+        second = await discover_mcp_tools(client)
+        assert [id(tool) for tool in first] == [id(tool) for tool in second]
+        
+        uncached = await discover_mcp_tools(client, cache=False)
+        assert {tool.name for tool in uncached} == {tool.name for tool in first}
+        assert all(a is not b for a, b in zip(first, uncached))
+        
+        invalidate_tools_cache(client)
+        refreshed = await discover_mcp_tools(client)
+        assert all(a is not b for a, b in zip(first, refreshed))
+    
+    @pytest.mark.asyncio
+    async def test_failed_discovery_is_not_cached(self):
+        """Test that discovery on an unconnected client doesn't cache an empty listing"""
+        fresh_client = MCPClient("http://localhost:8000")
+        assert await discover_mcp_tools(fresh_client) == []
+        
+        assert await fresh_client.connect()
+        try:
+            tools = await discover_mcp_tools(fresh_client)
+            assert {tool.name for tool in tools} >= {"get_weather_tool", "set_weather_tool", "list_cities_tool"}
+        finally:
+            await fresh_client.disconnect()
+        
+        # Disconnecting drops the wrappers bound to the closed session
+        assert await discover_mcp_tools(fresh_client) == []
+    
+    @pytest.mark.asyncio
+    async def test_array_arguments_keep_item_type(self, client):
+        """Test that array-typed tool arguments keep their element type in the args schema"""
+        tools = await discover_mcp_tools(client)
+        multi_tool = next(tool for tool in tools if tool.name == "get_weather_multi_tool")
+        
+        cities_schema = multi_tool.args_schema.model_json_schema()["properties"]["cities"]
+        assert cities_schema["type"] == "array"
+        assert cities_schema["items"] == {"type": "string"}
+    
+    @pytest.mark.asyncio
+    async def test_discovered_tools_are_functional(self, client):
         """Test that discovered tools actually work"""
-        tools = await discover_mcp_tools(real_client)
+        tools = await discover_mcp_tools(client)
         
         # Find the weather tool
         weather_tool = next(tool for tool in tools if tool.name == "get_weather_tool")
@@ -132,23 +158,11 @@ class TestToolDiscovery:
 class TestIntegrationScenarios:
     """Test suite for integration scenarios"""
     
-    @pytest.fixture
-    async def real_client(self):
-        """Create a real MCP client for testing (requires server)"""
-        client = MCPClient("http://localhost:8000")
-        connected = await client.connect()
-        if not connected:
-            pytest.skip("Could not connect to MCP server at http://localhost:8000. Make sure the server is running.")
-        
-        yield client
-        
-        await client.disconnect()
-    
     @pytest.mark.asyncio
-    async def test_full_workflow(self, real_client):
+    async def test_full_workflow(self, client):
         """Test the complete workflow: discover tools, create wrappers, use them"""
         # Discover tools
-        tools = await discover_mcp_tools(real_client)
+        tools = await discover_mcp_tools(client)
         assert len(tools) > 0
         
         # Use each tool
@@ -161,7 +175,76 @@ class TestIntegrationScenarios:
                 assert "Available cities" in result
     
     @pytest.mark.asyncio
-    async def test_langchain_compatibility(self, real_client):
+    async def test_batch_arun(self, client):
+        """Test that batched calls return results in call order"""
+        tools = await discover_mcp_tools(client)
+        weather_tool = next(tool for tool in tools if tool.name == "get_weather_tool")
+        
+        results = await weather_tool.batch_arun([{"city": "London"}, {"city": "Tokyo"}])
+        assert "Weather in London" in results[0]
+        assert "Weather in Tokyo" in results[1]
+    
+    @pytest.mark.asyncio
+    async def test_result_cache_invalidated_by_state_change(self, client):
+        """Test that read-only results are cached until a state-changing tool runs"""
+        tools = {tool.name: tool for tool in await discover_mcp_tools(client, cache=False)}
+        get_tool = tools["get_weather_tool"]
+        set_tool = tools["set_weather_tool"]
+        assert get_tool.cache_enabled
+        assert not set_tool.cache_enabled
+        
+        await set_tool._arun(city="cache_city", temperature=50.0, condition="cloudy")
+        result = await get_tool._arun(city="cache_city")
+        assert "50.0°F" in result
+        assert await get_tool._arun(city="cache_city") == result
+        
+        await set_tool._arun(city="cache_city", temperature=80.0, condition="sunny")
+        result = await get_tool._arun(city="cache_city")
+        assert "80.0°F" in result
+
+    @pytest.mark.asyncio
+    async def test_direct_wrapper_caches_only_read_only_tools(self, client):
+        """Test that a wrapper built by hand only caches when its tool is marked read-only"""
+        tool_config = {
+            "name": "set_weather_tool",
+            "description": "Set weather for a city",
+            "inputSchema": {"type": "object", "properties": {}},
+        }
+        set_tool = MCPToolWrapper(tool_config=tool_config, name="set_weather_tool", description="", mcp_client=client)
+        assert not set_tool.cache_enabled
+
+        tool_config["annotations"] = {"readOnlyHint": True}
+        get_tool = MCPToolWrapper(tool_config=tool_config, name="get_weather_tool", description="", mcp_client=client)
+        assert get_tool.cache_enabled
+
+    @pytest.mark.asyncio
+    async def test_discovery_applies_result_cache_ttl(self, client):
+        """Test that discovered wrappers cache results for the requested lifetime"""
+        tools = await discover_mcp_tools(client, cache=False, result_cache_ttl_seconds=5)
+
+        for tool in tools:
+            assert tool.cache_ttl == 5
+            assert tool._get_result_cache().ttl == 5
+
+    @pytest.mark.asyncio
+    async def test_cancelled_call_does_not_cancel_joiners(self, client):
+        """Test that a caller joining an in-flight call survives the owner's cancellation"""
+        tools = {tool.name: tool for tool in await discover_mcp_tools(client, cache=False)}
+        get_tool = tools["get_weather_tool"]
+        
+        leader = asyncio.create_task(get_tool._arun(city="London"))
+        await asyncio.sleep(0)
+        joiner = asyncio.create_task(get_tool._arun(city="London"))
+        await asyncio.sleep(0)
+        
+        leader.cancel()
+        result = await joiner
+        
+        assert leader.cancelled()
+        assert "Weather in London" in result
+    
+    @pytest.mark.asyncio
+    async def test_langchain_compatibility(self, client):
         """Test that our wrapper is compatible with LangChain BaseTool interface"""
         tool_config = {
             "name": "get_weather_tool",
@@ -184,7 +267,7 @@ class TestIntegrationScenarios:
             tool_config=tool_config,
             name="test_tool",
             description="Test tool",
-            mcp_client=real_client
+            mcp_client=client
         )
         
         # Check that it has the required LangChain BaseTool attributes
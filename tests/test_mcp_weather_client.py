@@ -15,59 +15,90 @@ Prerequisites:
 
 import asyncio
 import pytest
-import sys
-import os
+import re
+import socket
+import uuid
 from typing import List, Dict, Any
 
-# Add the parent directory to the path so we can import our modules
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from mcp_client import MCPClient
 
+# Tools and seeded cities the weather server always provides
+_EXPECTED_TOOLS = frozenset({"get_weather_tool", "get_weather_multi_tool", "set_weather_tool", "list_cities_tool"})
+_EXPECTED_CITIES = ("New York", "London", "Tokyo", "Sydney")
+
+# (city key, display name) for each seeded city
+_CITY_CASES = (("new_york", "New York"), ("london", "London"), ("tokyo", "Tokyo"), ("sydney", "Sydney"))
+
+# Precompiled result checks, so each assertion is a single scan of the text
+_EXPECTED_CITIES_RE = re.compile("|".join(map(re.escape, _EXPECTED_CITIES)))
+_WEATHER_RES = {
+    city: re.compile(rf"Weather in {re.escape(display_name)}: .*°F.*humidity")
+    for city, display_name in _CITY_CASES
+}
+
+
+async def _call_tool_text(client: MCPClient, name: str, **kwargs) -> str:
+    """Call a tool and check that it answered with text"""
+    result = await client.call_tool(name, **kwargs)
+    assert isinstance(result, str), f"{name} should return a string, got {type(result).__name__}"
+    return result
+
 
 class TestMCPWeatherClient:
     """Test cases for MCP Weather Client"""
     
-    @pytest.fixture
-    async def client(self):
-        """Create and connect a client for testing"""
-        client = MCPClient("http://localhost:8000")
-        connected = await client.connect()
-        if not connected:
-            pytest.skip("Could not connect to MCP server at http://localhost:8000. Make sure the server is running.")
-        
-        yield client
-        
-        # Cleanup: disconnect the client
-        await client.disconnect()
-    
     @pytest.mark.asyncio
     async def test_connection(self):
-        """Test that we can connect to the MCP server"""
+        """Test that we can connect to and disconnect from the MCP server"""
+        # A client of its own, so connect and disconnect run in this one task
         client = MCPClient("http://localhost:8000")
         
         # Test connection
         connected = await client.connect()
         assert connected, "Should be able to connect to MCP server"
+        assert client.session is not None, "Connected client should hold a session"
         
         # Test disconnection
         await client.disconnect()
+        assert client.session is None, "Disconnect should close the session"
     
     @pytest.mark.asyncio
-    async def test_list_tools(self, client):
-        """Test listing available tools"""
-        tools = await client.list_tools()
+    @pytest.mark.parametrize("transport", ["sse", "streamable_http"])
+    async def test_connect_to_unreachable_server(self, transport):
+        """Test that connecting to a server that isn't running reports failure"""
+        with socket.socket() as probe:
+            probe.bind(("localhost", 0))
+            port = probe.getsockname()[1]
+        
+        client = MCPClient(f"http://localhost:{port}", transport=transport)
+        connected = await client.connect()
+        
+        assert connected is False, "connect() should return False when nothing is listening"
+        assert client.session is None, "Failed connect should not leave a session behind"
+    
+    @pytest.mark.asyncio
+    async def test_http_client_is_reused(self, client):
+        """Test that tool calls share the session's pooled HTTP client"""
+        before = client.http_client
+        assert before is not None, "Connected client should hold an HTTP client"
+        
+        await client.call_tool("list_cities_tool")
+        await client.call_tool("get_weather_tool", city="london")
         
+        assert client.http_client is before, "Tool calls should not open a new HTTP client"
+        assert not before.is_closed, "HTTP client should stay open between calls"
+    
+    @pytest.mark.asyncio
+    async def test_list_tools(self, tools):
+        """Test listing available tools"""
         # Verify we get a list of tools
         assert isinstance(tools, list), "list_tools should return a list"
         assert len(tools) > 0, "Should have at least one tool available"
         
         # Check for expected tools
-        tool_names = [tool['name'] for tool in tools]
-        expected_tools = ['get_weather_tool', 'set_weather_tool', 'list_cities_tool']
-        
-        for expected_tool in expected_tools:
-            assert expected_tool in tool_names, f"Expected tool '{expected_tool}' not found in {tool_names}"
+        tool_names = {tool['name'] for tool in tools}
+        missing = _EXPECTED_TOOLS - tool_names
+        assert not missing, f"Expected tools {sorted(missing)} not found in {sorted(tool_names)}"
         
         # Verify tool structure
         for tool in tools:
@@ -79,92 +110,112 @@ class TestMCPWeatherClient:
     @pytest.mark.asyncio
     async def test_list_cities_tool(self, client):
         """Test the list_cities_tool"""
-        result = await client.call_tool("list_cities_tool")
+        result = await _call_tool_text(client, "list_cities_tool")
         
-        assert isinstance(result, str), "list_cities_tool should return a string"
         assert "Available cities:" in result, "Result should contain 'Available cities:'"
         
-        # Check for expected cities
-        expected_cities = ["New York", "London", "Tokyo", "Sydney"]
-        for city in expected_cities:
-            assert city in result, f"Expected city '{city}' not found in result: {result}"
+        # Check for expected cities in one scan of the result
+        missing = set(_EXPECTED_CITIES).difference(_EXPECTED_CITIES_RE.findall(result))
+        assert not missing, f"Expected cities {sorted(missing)} not found in result: {result}"
     
     @pytest.mark.asyncio
-    async def test_get_weather_tool_valid_city(self, client):
+    @pytest.mark.parametrize("city,display_name", _CITY_CASES)
+    async def test_get_weather_tool_valid_city(self, client, city, display_name):
         """Test getting weather for a valid city"""
-        result = await client.call_tool("get_weather_tool", city="new_york")
+        result = await _call_tool_text(client, "get_weather_tool", city=city)
         
-        assert isinstance(result, str), "get_weather_tool should return a string"
-        assert "Weather in New York:" in result, "Result should contain weather information for New York"
-        assert "°F" in result, "Result should contain temperature in Fahrenheit"
-        assert "humidity" in result, "Result should contain humidity information"
+        assert _WEATHER_RES[city].search(result), f"Result should contain weather for {display_name} with °F and humidity: {result}"
+    
+    @pytest.mark.asyncio
+    async def test_get_weather_multi_tool(self, client):
+        """Test getting weather for several cities in one call"""
+        result = await _call_tool_text(client, "get_weather_multi_tool", cities=["new_york", "london", "nonexistent_city"])
+        
+        lines = result.split("\n")
+        assert len(lines) == 3, "Should return one line per requested city"
+        assert "Weather in New York:" in lines[0], "First line should be for New York"
+        assert "Weather in London:" in lines[1], "Second line should be for London"
+        assert "Weather data not available" in lines[2], "Unknown cities should be reported in place"
     
     @pytest.mark.asyncio
     async def test_get_weather_tool_invalid_city(self, client):
         """Test getting weather for an invalid city"""
-        result = await client.call_tool("get_weather_tool", city="nonexistent_city")
+        result = await _call_tool_text(client, "get_weather_tool", city="nonexistent_city")
         
-        assert isinstance(result, str), "get_weather_tool should return a string"
         assert "Weather data not available" in result, "Should indicate data not available"
         assert "Available cities:" in result, "Should list available cities"
     
     @pytest.mark.asyncio
     async def test_set_weather_tool(self, client):
         """Test setting weather for a city"""
-        # Set weather for a new city
-        result = await client.call_tool("set_weather_tool", 
-            city="test_city",
+        # Set weather for a new city, unique per run so test order doesn't matter
+        city = f"test_city_{uuid.uuid4().hex}"
+        display_name = city.replace("_", " ").title()
+        result = await _call_tool_text(client, "set_weather_tool", 
+            city=city,
             temperature=75.0,
             condition="sunny"
         )
         
-        assert isinstance(result, str), "set_weather_tool should return a string"
-        assert "Weather updated for Test City:" in result, "Should confirm weather update"
+        # Verify the write with independent reads pipelined in one round trip;
+        # they must not share a batch with the set, which they depend on.
+        # They are sent now and the set response is checked while they're in flight
+        reads = asyncio.create_task(client.call_tools([
+            ("get_weather_tool", {"city": city}),
+            ("list_cities_tool", {}),
+        ]))
+        
+        assert f"Weather updated for {display_name}:" in result, "Should confirm weather update"
         assert "75" in result, "Should contain the temperature"
         assert "sunny" in result, "Should contain the condition"
         
-        # Verify we can retrieve the weather we just set
-        get_result = await client.call_tool("get_weather_tool", city="test_city")
-        assert "Weather in Test City:" in get_result, "Should be able to get weather for the city we just set"
+        get_result, cities_result = await reads
+        assert f"Weather in {display_name}:" in get_result, "Should be able to get weather for the city we just set"
         assert "75.0°F" in get_result, "Should contain the temperature we set"
+        assert display_name in cities_result, "New city should be listed"
     
     @pytest.mark.asyncio
     async def test_tool_with_missing_parameters(self, client):
         """Test calling a tool with missing required parameters"""
-        # This should handle the error gracefully
-        result = await client.call_tool("get_weather_tool")
-        
-        # The result should indicate an error or handle missing parameters
-        assert isinstance(result, str), "Should return a string even with missing parameters"
-        # The exact error handling depends on the implementation
+        # This should handle the error gracefully and still return a string;
+        # the exact error handling depends on the implementation
+        await _call_tool_text(client, "get_weather_tool")
     
     @pytest.mark.asyncio
     async def test_nonexistent_tool(self, client):
         """Test calling a tool that doesn't exist"""
-        result = await client.call_tool("nonexistent_tool")
-        
-        # Should handle unknown tools gracefully
-        assert isinstance(result, str), "Should return a string for unknown tools"
+        # Should handle unknown tools gracefully and still return a string
+        await _call_tool_text(client, "nonexistent_tool")
     
     @pytest.mark.asyncio
-    async def test_multiple_operations(self, client):
+    async def test_call_tools(self, client):
+        """Test calling several independent tools at once"""
+        cities_result, weather_result = await client.call_tools([
+            ("list_cities_tool", {}),
+            ("get_weather_tool", {"city": "london"}),
+        ])
+        
+        assert "Available cities:" in cities_result, "First result should belong to the first call"
+        assert "Weather in London:" in weather_result, "Second result should belong to the second call"
+    
+    @pytest.mark.asyncio
+    async def test_multiple_operations(self, client, tools):
         """Test performing multiple operations in sequence"""
-        # List tools
-        tools = await client.list_tools()
+        # Tools listed once for the session
         assert len(tools) > 0, "Should have tools available"
         
-        # List cities
-        cities_result = await client.call_tool("list_cities_tool")
+        # List cities and get weather for multiple cities at once over the shared session
+        cities_result, *weather_results = await asyncio.gather(
+            client.call_tool("list_cities_tool"),
+            *(client.call_tool("get_weather_tool", city=city) for city, _ in _CITY_CASES)
+        )
         assert "Available cities:" in cities_result, "Should list cities"
-        
-        # Get weather for multiple cities
-        for city in ["new_york", "london", "tokyo"]:
-            weather_result = await client.call_tool("get_weather_tool", city=city)
-            assert f"Weather in {city.replace('_', ' ').title()}:" in weather_result, f"Should get weather for {city}"
+        for (city, display_name), weather_result in zip(_CITY_CASES, weather_results):
+            assert f"Weather in {display_name}:" in weather_result, f"Should get weather for {city}"
         
         # Set weather for a new city
-        set_result = await client.call_tool("set_weather_tool", 
-            city="test_multiple",
+        set_result = await _call_tool_text(client, "set_weather_tool", 
+            city=f"test_multiple_{uuid.uuid4().hex}",
             temperature=68.0,
             condition="cloudy"
         )